@@ -0,0 +1,182 @@
+"""
+BLACKBOX Admission Control
+Bounded in-flight work and per-service rate limits for ingestion
+"""
+
+from fastapi import HTTPException
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+from schemas import EventCreate, EventLevel
+import math
+import os
+import threading
+import time
+
+
+# Defaults follow SQLAlchemy's QueuePool (5 connections + 10 overflow),
+# so admitted work never queues on the connection pool.
+MAX_IN_FLIGHT = int(os.getenv("INGEST_MAX_IN_FLIGHT", "15"))
+PRIORITY_RESERVE = int(os.getenv("INGEST_PRIORITY_RESERVE", "5"))
+INCIDENT_RESERVE = int(os.getenv("INGEST_INCIDENT_RESERVE", "2"))
+SERVICE_RATE = float(os.getenv("INGEST_SERVICE_RATE", "50"))  # Events per second
+SERVICE_BURST = float(os.getenv("INGEST_SERVICE_BURST", "100"))
+ERROR_RATE = float(os.getenv("INGEST_ERROR_RATE", "200"))  # Error events per second
+ERROR_BURST = float(os.getenv("INGEST_ERROR_BURST", "400"))
+MAX_TRACKED_SERVICES = int(os.getenv("INGEST_MAX_TRACKED_SERVICES", "10000"))
+SATURATED_RETRY_AFTER = 1  # Seconds
+
+# Lanes, most important first
+INCIDENT_LANE = "incident"
+ERROR_LANE = "error"
+BULK_LANE = "bulk"
+
+
+class TokenBucket:
+    """Classic token bucket: refills at `rate` per second up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take one token.
+        Returns 0 if admitted, otherwise seconds until a token is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Three-lane admission control.
+
+    Incident lane (incident reads and resolution) may use every slot.
+    Error lane (error events) must leave `incident_reserve` slots free,
+    so an outage's error spike cannot lock responders out of incidents.
+    Bulk lane (info/warning events, raw event listing) must leave
+    `priority_reserve` slots free, so floods of low-level events cannot
+    starve incident detection.
+
+    Events in the error and bulk lanes are also rate limited per service,
+    error events with a separate, more generous bucket.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        priority_reserve: int = PRIORITY_RESERVE,
+        incident_reserve: int = INCIDENT_RESERVE,
+        service_rate: float = SERVICE_RATE,
+        service_burst: float = SERVICE_BURST,
+        error_rate: float = ERROR_RATE,
+        error_burst: float = ERROR_BURST,
+        max_tracked_services: int = MAX_TRACKED_SERVICES
+    ):
+        if service_rate <= 0:
+            raise ValueError("INGEST_SERVICE_RATE must be greater than 0")
+        if service_burst < 1:
+            raise ValueError("INGEST_SERVICE_BURST must be at least 1")
+        if error_rate <= 0:
+            raise ValueError("INGEST_ERROR_RATE must be greater than 0")
+        if error_burst < 1:
+            raise ValueError("INGEST_ERROR_BURST must be at least 1")
+        if max_tracked_services < 1:
+            raise ValueError("INGEST_MAX_TRACKED_SERVICES must be at least 1")
+
+        self.max_in_flight = max_in_flight
+        self.priority_reserve = min(priority_reserve, max_in_flight)
+        self.incident_reserve = min(incident_reserve, self.priority_reserve)
+        self.rates = {
+            ERROR_LANE: (error_rate, error_burst),
+            BULK_LANE: (service_rate, service_burst),
+        }
+        self.max_tracked_services = max_tracked_services
+        self.in_flight = 0
+        # Keyed by (lane, service), least recently used first; bounded so
+        # arbitrary service names cannot grow memory without limit
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _limit(self, lane: str) -> int:
+        if lane == INCIDENT_LANE:
+            return self.max_in_flight
+        if lane == ERROR_LANE:
+            return self.max_in_flight - self.incident_reserve
+        return self.max_in_flight - self.priority_reserve
+
+    def _reject(self, retry_after: float, detail: str) -> None:
+        raise HTTPException(
+            status_code=429,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def acquire(self, lane: str, service: Optional[str] = None) -> None:
+        """Claim an in-flight slot or raise 429 with Retry-After."""
+        with self._lock:
+            if self.in_flight >= self._limit(lane):
+                self._reject(SATURATED_RETRY_AFTER, "Server saturated, retry later")
+
+            if lane in self.rates and service is not None:
+                key = (lane, service)
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(*self.rates[lane])
+                    if len(self._buckets) > self.max_tracked_services:
+                        self._buckets.popitem(last=False)
+                else:
+                    self._buckets.move_to_end(key)
+                wait = bucket.take()
+                if wait:
+                    self._reject(wait, f"Rate limit exceeded for service '{service}'")
+
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    @contextmanager
+    def admit(self, lane: str, service: Optional[str] = None) -> Iterator[None]:
+        self.acquire(lane, service)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+# Shared by all endpoints in this worker process
+admission = AdmissionController()
+
+
+def ingest_lane(event: EventCreate) -> Iterator[None]:
+    """
+    Dependency for event ingestion.
+    Declared ahead of get_db so the slot covers the whole request,
+    including the session's lifetime.
+    """
+    lane = ERROR_LANE if event.level == EventLevel.ERROR else BULK_LANE
+    with admission.admit(lane, service=event.service):
+        yield
+
+
+def incident_lane() -> Iterator[None]:
+    """Dependency for incident reads and writes."""
+    with admission.admit(INCIDENT_LANE):
+        yield
+
+
+def bulk_lane() -> Iterator[None]:
+    """Dependency for low-priority reads."""
+    with admission.admit(BULK_LANE):
+        yield
@@ -0,0 +1,563 @@
+"""
+BLACKBOX Cold Event Archive
+Compact, column-oriented segment files for historical analysis
+"""
+
+from sqlalchemy.orm import Session
+from models import Event, IncidentEvent
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate, count
+from operator import add
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+
+# Segment layout:
+#   MAGIC | row groups | link columns | footer (JSON) | footer length (uint32 LE) | MAGIC
+# Events are split into row groups of ROW_GROUP_ROWS. Every column of every
+# group is an independently zlib-compressed little-endian array, and the
+# footer records each block's offset and each group's timestamp range, so a
+# query only inflates the columns and groups it actually touches.
+# The footer comes last so segments can be written in a single streaming pass.
+MAGIC = b"BBXSEG02"
+SEGMENT_SUFFIX = ".bbx"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "segments")
+ROW_GROUP_ROWS = 65536
+CACHE_BYTES = int(os.getenv("ARCHIVE_CACHE_MB", "64")) * 1024 * 1024
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Stored timestamps are naive UTC; convert aware datetimes to match."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_utc(value: str) -> datetime:
+    """Parse an ISO 8601 CLI argument (e.g. 2026-01-01T00:00:00Z) to naive UTC."""
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    return _naive_utc(datetime.fromisoformat(value))
+
+
+def _to_micros(value: datetime) -> int:
+    return (_naive_utc(value) - EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _pack(typecode: str, values) -> bytes:
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return zlib.compress(data.tobytes())
+
+
+def _unpack(typecode: str, block: bytes) -> array:
+    data = array(typecode)
+    data.frombytes(zlib.decompress(block))
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def _delta_encode(values: List[int]) -> List[int]:
+    previous = 0
+    deltas = []
+    for value in values:
+        deltas.append(value - previous)
+        previous = value
+    return deltas
+
+
+def _delta_decode(deltas: array) -> array:
+    return array(deltas.typecode, accumulate(deltas))
+
+
+class _Dictionary:
+    """String dictionary that grows while a segment is written."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, value: str) -> int:
+        return self.codes.setdefault(value, len(self.codes))
+
+    @property
+    def values(self) -> List[str]:
+        return list(self.codes)
+
+
+def _pack_strings(values: List[Optional[str]]) -> bytes:
+    """
+    UTF-8 strings as count | lengths (uint32) | NULL flags (uint8) | payload,
+    so a reader can decode single values without splitting the whole block.
+    """
+    lengths = array("I")
+    nulls = bytearray()
+    payload = bytearray()
+    for value in values:
+        encoded = b"" if value is None else value.encode("utf-8")
+        lengths.append(len(encoded))
+        nulls.append(value is None)
+        payload += encoded
+    if sys.byteorder == "big":
+        lengths.byteswap()
+    return zlib.compress(struct.pack("<I", len(values)) + lengths.tobytes() + bytes(nulls) + bytes(payload))
+
+
+class _StringColumn:
+    """Inflated string block; values are decoded on access."""
+
+    def __init__(self, block: bytes):
+        self._raw = zlib.decompress(block)
+        (count,) = struct.unpack_from("<I", self._raw)
+        lengths = array("I")
+        lengths.frombytes(self._raw[4:4 + count * lengths.itemsize])
+        if sys.byteorder == "big":
+            lengths.byteswap()
+        self._offsets = array("q", accumulate(lengths, initial=0))
+        self._nulls = 4 + count * lengths.itemsize
+        self._payload = self._nulls + count
+        self.nbytes = len(self._raw) + len(self._offsets) * self._offsets.itemsize
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        if self._raw[self._nulls + row]:
+            return None
+        begin = self._payload + self._offsets[row]
+        return self._raw[begin:self._payload + self._offsets[row + 1]].decode("utf-8")
+
+
+class _SegmentWriter:
+    """Appends compressed blocks to a segment file, tracking their offsets."""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.offset = len(MAGIC)
+        handle.write(MAGIC)
+
+    def write(self, encoding: str, block: bytes) -> dict:
+        meta = {"offset": self.offset, "length": len(block), "encoding": encoding}
+        self.handle.write(block)
+        self.offset += len(block)
+        return meta
+
+
+def _write_row_group(writer: _SegmentWriter, rows: List[tuple], dictionaries: Dict[str, _Dictionary]) -> dict:
+    ids, timestamps, received, services, environments, levels, request_ids, messages = zip(*rows)
+    return {
+        "rows": len(rows),
+        "min_ts": timestamps[0],
+        "max_ts": timestamps[-1],
+        "columns": {
+            "id": writer.write("delta:q", _pack("q", _delta_encode(ids))),
+            "timestamp": writer.write("delta:q", _pack("q", _delta_encode(timestamps))),
+            "received_at": writer.write("skew:q", _pack("q", [r - ts for r, ts in zip(received, timestamps)])),
+            "service": writer.write("dict:I", _pack("I", map(dictionaries["service"].encode, services))),
+            "environment": writer.write("dict:I", _pack("I", map(dictionaries["environment"].encode, environments))),
+            "level": writer.write("dict:I", _pack("I", map(dictionaries["level"].encode, levels))),
+            "request_id": writer.write("str", _pack_strings(request_ids)),
+            "message": writer.write("str", _pack_strings(messages)),
+        },
+    }
+
+
+def export_segment(db: Session, start: datetime, end: datetime, path: str) -> int:
+    """
+    Write all events with start <= timestamp < end to a segment file,
+    together with their incident correlations.
+
+    Rows are streamed from the database and written a row group at a time,
+    so memory stays flat however large the range is.
+    Events are immutable, so the hot rows are left in place.
+    Returns the number of archived events.
+    """
+    events = db.query(
+        Event.id, Event.timestamp, Event.received_at, Event.service,
+        Event.environment, Event.level, Event.request_id, Event.message
+    ).filter(
+        Event.timestamp >= start,
+        Event.timestamp < end
+    ).order_by(Event.timestamp.asc(), Event.id.asc()).yield_per(ROW_GROUP_ROWS)
+
+    # Links locate their event by (timestamp, id), which needs no row map
+    links = db.query(
+        IncidentEvent.incident_id, Event.timestamp, Event.id, IncidentEvent.correlation_reason
+    ).join(Event).filter(
+        Event.timestamp >= start,
+        Event.timestamp < end
+    ).order_by(
+        IncidentEvent.incident_id.asc(), Event.timestamp.asc(), Event.id.asc()
+    ).yield_per(ROW_GROUP_ROWS)
+
+    dictionaries = {name: _Dictionary() for name in ("service", "environment", "level", "link_reason")}
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as handle:
+        writer = _SegmentWriter(handle)
+
+        groups = []
+        pending = []
+        total = 0
+        for event_id, timestamp, received_at, service, environment, level, request_id, message in events:
+            micros = _to_micros(timestamp)
+            pending.append((
+                event_id, micros, _to_micros(received_at), service, environment,
+                str(getattr(level, "value", level)), request_id, message
+            ))
+            if len(pending) == ROW_GROUP_ROWS:
+                groups.append(_write_row_group(writer, pending, dictionaries))
+                total += len(pending)
+                pending = []
+        if pending:
+            groups.append(_write_row_group(writer, pending, dictionaries))
+            total += len(pending)
+
+        link_incident_ids, link_timestamps, link_event_ids = array("q"), array("q"), array("q")
+        link_reasons = array("I")
+        for incident_id, timestamp, event_id, reason in links:
+            link_incident_ids.append(incident_id)
+            link_timestamps.append(_to_micros(timestamp))
+            link_event_ids.append(event_id)
+            link_reasons.append(dictionaries["link_reason"].encode(reason))
+
+        link_columns = {
+            "link_incident_id": writer.write("plain:q", _pack("q", link_incident_ids)),
+            "link_timestamp": writer.write("plain:q", _pack("q", link_timestamps)),
+            "link_event_id": writer.write("plain:q", _pack("q", link_event_ids)),
+            "link_reason": writer.write("dict:I", _pack("I", link_reasons)),
+        }
+
+        footer = json.dumps({
+            "version": 2,
+            "rows": total,
+            "links": len(link_incident_ids),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "min_ts": groups[0]["min_ts"] if groups else None,
+            "max_ts": groups[-1]["max_ts"] if groups else None,
+            "incident_ids": sorted(set(link_incident_ids)),
+            "dictionaries": {name: dictionary.values for name, dictionary in dictionaries.items()},
+            "row_groups": groups,
+            "link_columns": link_columns,
+        }).encode("utf-8")
+
+        handle.write(footer)
+        handle.write(struct.pack("<I", len(footer)))
+        handle.write(MAGIC)
+    os.replace(tmp_path, path)
+
+    return total
+
+
+def _nbytes(values) -> int:
+    if isinstance(values, array):
+        return len(values) * values.itemsize
+    return values.nbytes
+
+
+class _ColumnCache:
+    """
+    Inflated column blocks shared by all open segments.
+    Least recently used blocks are evicted once max_bytes is exceeded.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._blocks: "OrderedDict[tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            values = self._blocks.get(key)
+            if values is not None:
+                self._blocks.move_to_end(key)
+            return values
+
+    def put(self, key: tuple, values) -> None:
+        nbytes = _nbytes(values)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._blocks:
+                return
+            self._blocks[key] = values
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self._blocks.popitem(last=False)
+                self.size -= _nbytes(evicted)
+
+
+_column_cache = _ColumnCache(CACHE_BYTES)
+
+# Distinguishes cache entries of segments that reuse a path
+_segment_serial = count()
+
+
+class ArchiveSegment:
+    """
+    Read-only, memory-mapped view of a segment file.
+    Column blocks are inflated lazily, one row group at a time, and kept
+    in the shared, size-bounded column cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        size = len(self._map)
+        tail = size - len(MAGIC) - 4
+        if size < 2 * len(MAGIC) + 4 or self._map[:len(MAGIC)] != MAGIC or self._map[size - len(MAGIC):] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a BLACKBOX archive segment")
+
+        (footer_length,) = struct.unpack_from("<I", self._map, tail)
+        self.header = json.loads(self._map[tail - footer_length:tail])
+        self._serial = next(_segment_serial)
+
+        groups = self.header["row_groups"]
+        self._group_min_ts = [group["min_ts"] for group in groups]
+        self._group_max_ts = [group["max_ts"] for group in groups]
+
+    @property
+    def rows(self) -> int:
+        return self.header["rows"]
+
+    @property
+    def incident_ids(self) -> List[int]:
+        return self.header["incident_ids"]
+
+    def overlaps(self, start: Optional[datetime], end: Optional[datetime]) -> bool:
+        """Cheap footer-only check used to skip whole segments."""
+        if self.header["min_ts"] is None:
+            return False
+        if start is not None and self.header["max_ts"] < _to_micros(start):
+            return False
+        if end is not None and self.header["min_ts"] >= _to_micros(end):
+            return False
+        return True
+
+    def _decode(self, meta: dict, key: tuple, group: Optional[int] = None):
+        cache_key = (self._serial,) + key
+        values = _column_cache.get(cache_key)
+        if values is not None:
+            return values
+
+        kind, _, typecode = meta["encoding"].partition(":")
+        block = self._map[meta["offset"]:meta["offset"] + meta["length"]]
+        if kind == "str":
+            values = _StringColumn(block)
+        elif kind == "delta":
+            values = _delta_decode(_unpack(typecode, block))
+        elif kind == "skew":
+            timestamps = self._group_column(group, "timestamp")
+            values = array("q", map(add, _unpack(typecode, block), timestamps))
+        else:
+            values = _unpack(typecode, block)
+
+        _column_cache.put(cache_key, values)
+        return values
+
+    def _group_column(self, group: int, name: str):
+        meta = self.header["row_groups"][group]["columns"][name]
+        return self._decode(meta, (group, name), group)
+
+    def _link_column(self, name: str):
+        return self._decode(self.header["link_columns"][name], ("links", name))
+
+    def _groups_between(self, start: Optional[int], end: Optional[int]) -> range:
+        """Row groups that may hold timestamps in [start, end] (micros, inclusive)."""
+        first = bisect_left(self._group_max_ts, start) if start is not None else 0
+        last = bisect_right(self._group_min_ts, end) if end is not None else len(self._group_min_ts)
+        return range(first, last)
+
+    def _decoded(self, name: str, code: int) -> str:
+        return self.header["dictionaries"][name][code]
+
+    def _row(self, group: int, row: int) -> dict:
+        return {
+            "id": self._group_column(group, "id")[row],
+            "service": self._decoded("service", self._group_column(group, "service")[row]),
+            "environment": self._decoded("environment", self._group_column(group, "environment")[row]),
+            "level": self._decoded("level", self._group_column(group, "level")[row]),
+            "message": self._group_column(group, "message")[row],
+            "request_id": self._group_column(group, "request_id")[row],
+            "timestamp": _from_micros(self._group_column(group, "timestamp")[row]),
+            "received_at": _from_micros(self._group_column(group, "received_at")[row]),
+        }
+
+    def _locate(self, timestamp: int, event_id: int) -> Optional[Tuple[int, int]]:
+        """(row group, row) of an event, found through the timestamp column."""
+        for group in self._groups_between(timestamp, timestamp):
+            timestamps = self._group_column(group, "timestamp")
+            ids = self._group_column(group, "id")
+            for row in range(bisect_left(timestamps, timestamp), bisect_right(timestamps, timestamp)):
+                if ids[row] == event_id:
+                    return group, row
+        return None
+
+    def timeline(self, incident_id: int) -> List[dict]:
+        """
+        Rebuild the archived part of an incident timeline.
+        Links are stored in timestamp order per incident, and only the
+        row groups holding linked events are inflated.
+        """
+        incident_column = self._link_column("link_incident_id")
+        first = bisect_left(incident_column, incident_id)
+        last = bisect_right(incident_column, incident_id)
+        if first == last:
+            return []
+
+        link_timestamps = self._link_column("link_timestamp")
+        link_event_ids = self._link_column("link_event_id")
+        link_reasons = self._link_column("link_reason")
+
+        timeline = []
+        for i in range(first, last):
+            location = self._locate(link_timestamps[i], link_event_ids[i])
+            if location is None:
+                # Event written after the segment's rows were read
+                continue
+            event = self._row(*location)
+            event["correlation_reason"] = self._decoded("link_reason", link_reasons[i])
+            timeline.append(event)
+        return timeline
+
+    def scan(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        service: Optional[str] = None,
+        level: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Range scan over archived events.
+        Row groups outside the range are skipped from the footer, timestamps
+        within a group are found by bisection, and filters are applied on
+        dictionary codes before decoding rows.
+        """
+        start_micros = _to_micros(start) if start else None
+        end_micros = _to_micros(end) if end else None
+
+        filters = []
+        for name, value in (("service", service), ("level", level)):
+            if value is None:
+                continue
+            dictionary = self.header["dictionaries"][name]
+            if value not in dictionary:
+                return []
+            filters.append((name, dictionary.index(value)))
+
+        results = []
+        for group in self._groups_between(start_micros, end_micros):
+            timestamps = self._group_column(group, "timestamp")
+            first = bisect_left(timestamps, start_micros) if start_micros is not None else 0
+            last = bisect_left(timestamps, end_micros) if end_micros is not None else len(timestamps)
+            rows = range(first, last)
+
+            for name, code in filters:
+                codes = self._group_column(group, name)
+                rows = [row for row in rows if codes[row] == code]
+
+            results.extend(self._row(group, row) for row in rows)
+        return results
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+# Open segments keyed by path, invalidated when the file changes on disk.
+# Replaced segments are never closed explicitly: a request thread may still
+# be reading one, so its map is released when the last reference goes away.
+_segments: Dict[str, tuple] = {}
+_segments_lock = threading.Lock()
+
+
+def open_segments(directory: str = ARCHIVE_DIR) -> List[ArchiveSegment]:
+    """Return every segment in the archive directory, reusing open maps."""
+    if not os.path.isdir(directory):
+        return []
+
+    segments = []
+    with _segments_lock:
+        paths = set()
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            path = os.path.join(directory, name)
+            paths.add(path)
+            mtime = os.path.getmtime(path)
+
+            cached = _segments.get(path)
+            if cached and cached[0] == mtime:
+                segments.append(cached[1])
+                continue
+
+            segment = ArchiveSegment(path)
+            _segments[path] = (mtime, segment)
+            segments.append(segment)
+
+        # Forget segments deleted from this directory
+        for path in [p for p in _segments if os.path.dirname(p) == directory and p not in paths]:
+            del _segments[path]
+
+    return segments
+
+
+def get_archived_timeline(incident_id: int, directory: str = ARCHIVE_DIR) -> List[dict]:
+    """
+    Merge an incident's archived timeline across all segments.
+    Overlapping exports may contain the same event twice; ids are unique.
+    """
+    events_by_id = {}
+    for segment in open_segments(directory):
+        if incident_id in segment.incident_ids:
+            for event in segment.timeline(incident_id):
+                events_by_id.setdefault(event["id"], event)
+    return sorted(events_by_id.values(), key=lambda event: (event["timestamp"], event["id"]))
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export cold events to an archive segment")
+    parser.add_argument("--start", required=True, help="Inclusive start (ISO 8601, UTC)")
+    parser.add_argument("--end", required=True, help="Exclusive end (ISO 8601, UTC)")
+    parser.add_argument("--out", help="Segment path (defaults to ARCHIVE_DIR/<start>_<end>.bbx)")
+    args = parser.parse_args()
+
+    start = parse_utc(args.start)
+    end = parse_utc(args.end)
+    out = args.out or os.path.join(
+        ARCHIVE_DIR,
+        f"{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}{SEGMENT_SUFFIX}"
+    )
+
+    db = SessionLocal()
+    try:
+        count = export_segment(db, start, end, out)
+    finally:
+        db.close()
+
+    print(f"Archived {count} events to {out}")
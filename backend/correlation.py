@@ -3,10 +3,12 @@ BLACKBOX Correlation Engine
 Deterministic, explainable event correlation
 """
 
+from sqlalchemy import delete, false, func, update
 from sqlalchemy.orm import Session
-from models import Event, Incident, IncidentEvent, IncidentStatus
+from models import Event, Incident, IncidentEvent, IncidentStatus, RequestService, ServiceEdge
 from datetime import datetime, timedelta
 from typing import List, Optional
+from collections import Counter
 
 
 class CorrelationEngine:
@@ -19,10 +21,24 @@ class CorrelationEngine:
     ERROR_THRESHOLD = 5  # Number of errors to trigger incident
     TIME_WINDOW_MINUTES = 3  # Rolling window for error detection
     CORRELATION_WINDOW_MINUTES = 10  # Window for correlating related events
+    EDGE_BUCKET_MINUTES = 5  # Granularity of the service edge index
+    EDGE_INDEX_DIALECTS = ("postgresql", "sqlite")  # Need an atomic upsert
 
     def __init__(self, db: Session):
         self.db = db
 
+    @classmethod
+    def check_dialect(cls, dialect: str) -> None:
+        """
+        Fail fast on databases the service edge index cannot write to,
+        rather than on every ingested event.
+        """
+        if dialect not in cls.EDGE_INDEX_DIALECTS:
+            raise RuntimeError(
+                f"Unsupported database '{dialect}': the service edge index "
+                f"needs one of {', '.join(cls.EDGE_INDEX_DIALECTS)}"
+            )
+
     def detect_incidents(self, service: str, environment: str) -> Optional[Incident]:
         """
         Detect if error threshold is crossed for a service.
@@ -120,6 +136,197 @@ class CorrelationEngine:
 
         self.db.commit()
 
+    @staticmethod
+    def _service_hops(first_seen_by_service: dict) -> Counter:
+        """
+        Hops of one request: consecutive services in order of first appearance.
+        Each hop is (source, target, hop_time, lag_seconds).
+        """
+        chain = sorted((ts, service) for service, ts in first_seen_by_service.items())
+        return Counter(
+            (source, target, target_ts, (target_ts - source_ts).total_seconds())
+            for (source_ts, source), (target_ts, target) in zip(chain, chain[1:])
+        )
+
+    def _edge_bucket(self, hop_time: datetime) -> datetime:
+        bucket_size = timedelta(minutes=self.EDGE_BUCKET_MINUTES)
+        return datetime.min + ((hop_time - datetime.min) // bucket_size) * bucket_size
+
+    def _add_hop(self, environment: str, source: str, target: str, hop_time: datetime, lag: float) -> None:
+        """Atomic upsert; concurrent ingests cannot lose increments."""
+        if self.db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            least, greatest = func.least, func.greatest
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+            least, greatest = func.min, func.max
+
+        statement = insert(ServiceEdge).values(
+            environment=environment,
+            source_service=source,
+            target_service=target,
+            bucket_start=self._edge_bucket(hop_time),
+            weight=1,
+            first_seen=hop_time,
+            last_seen=hop_time,
+            total_lag_seconds=lag
+        )
+        self.db.execute(statement.on_conflict_do_update(
+            index_elements=["environment", "bucket_start", "source_service", "target_service"],
+            set_={
+                "weight": ServiceEdge.weight + 1,
+                "total_lag_seconds": ServiceEdge.total_lag_seconds + statement.excluded.total_lag_seconds,
+                "first_seen": least(ServiceEdge.first_seen, statement.excluded.first_seen),
+                "last_seen": greatest(ServiceEdge.last_seen, statement.excluded.last_seen),
+            }
+        ))
+
+    def _remove_hop(self, environment: str, source: str, target: str, hop_time: datetime, lag: float) -> None:
+        """
+        Atomic decrement of a hop superseded by a late event.
+        first_seen/last_seen keep their widest extent.
+        """
+        edge = (
+            (ServiceEdge.environment == environment)
+            & (ServiceEdge.bucket_start == self._edge_bucket(hop_time))
+            & (ServiceEdge.source_service == source)
+            & (ServiceEdge.target_service == target)
+        )
+        self.db.execute(update(ServiceEdge).where(edge).values(
+            weight=ServiceEdge.weight - 1,
+            total_lag_seconds=ServiceEdge.total_lag_seconds - lag
+        ))
+        self.db.execute(delete(ServiceEdge).where(edge, ServiceEdge.weight <= 0))
+
+    def _lock_request(self, environment: str, request_id: str) -> None:
+        """
+        Serialize index updates for one request until the next commit.
+        SQLite has a single writer, so any write takes its lock.
+        """
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(func.pg_advisory_xact_lock(
+                func.hashtext(f"{environment}:{request_id}")
+            ).select())
+        else:
+            self.db.execute(update(RequestService).where(false()).values(first_seen=None))
+
+    def record_service_edges(self, event: Event) -> None:
+        """
+        Maintain the service edge index for a newly ingested event.
+        Each request_id contributes its services as a chain ordered by first
+        appearance. Events may arrive late or out of order, so the chain is
+        rebuilt with and without this event and only the difference is
+        applied: a service landing between two others splits their hop.
+
+        The chain comes from request_services, not the events table, so
+        sibling events committed but not yet indexed are not counted twice.
+        """
+        if not event.request_id:
+            return
+
+        self._lock_request(event.environment, event.request_id)
+
+        entries = {
+            entry.service: entry
+            for entry in self.db.query(RequestService).filter(
+                RequestService.environment == event.environment,
+                RequestService.request_id == event.request_id
+            )
+        }
+        entry = entries.get(event.service)
+        if entry and entry.first_seen <= event.timestamp:
+            # Service already seen at or before this event: chain unchanged
+            self.db.commit()
+            return
+
+        first_seen_by_service = {service: e.first_seen for service, e in entries.items()}
+        before = self._service_hops(first_seen_by_service)
+        first_seen_by_service[event.service] = event.timestamp
+        after = self._service_hops(first_seen_by_service)
+
+        if entry:
+            entry.first_seen = event.timestamp
+        else:
+            self.db.add(RequestService(
+                environment=event.environment,
+                request_id=event.request_id,
+                service=event.service,
+                first_seen=event.timestamp
+            ))
+
+        for hop in (before - after).elements():
+            self._remove_hop(event.environment, *hop)
+        for hop in (after - before).elements():
+            self._add_hop(event.environment, *hop)
+
+        self.db.commit()
+
+    def get_propagation_graph(self, incident: Incident) -> List[dict]:
+        """
+        Propagation paths through the incident's primary service.
+        Read from the edge index; the incident's events are not scanned.
+
+        Only edges on a path into or out of the primary service are kept.
+        Open incidents are capped at CORRELATION_WINDOW_MINUTES after start.
+        Edges are returned in order of first appearance.
+        """
+        bucket_size = timedelta(minutes=self.EDGE_BUCKET_MINUTES)
+        end_time = incident.end_time or incident.start_time + timedelta(minutes=self.CORRELATION_WINDOW_MINUTES)
+
+        rows = self.db.query(
+            ServiceEdge.source_service,
+            ServiceEdge.target_service,
+            func.sum(ServiceEdge.weight),
+            func.min(ServiceEdge.first_seen),
+            func.max(ServiceEdge.last_seen),
+            func.sum(ServiceEdge.total_lag_seconds)
+        ).filter(
+            ServiceEdge.environment == incident.environment,
+            ServiceEdge.bucket_start > incident.start_time - bucket_size,
+            ServiceEdge.bucket_start <= end_time,
+            ServiceEdge.last_seen >= incident.start_time,
+            ServiceEdge.first_seen <= end_time
+        ).group_by(
+            ServiceEdge.source_service,
+            ServiceEdge.target_service
+        ).all()
+
+        # Services downstream of the primary service, and upstream of it
+        downstream = self._reachable(incident.primary_service, [(row[0], row[1]) for row in rows])
+        upstream = self._reachable(incident.primary_service, [(row[1], row[0]) for row in rows])
+
+        edges = [
+            {
+                "source": source,
+                "target": target,
+                "weight": int(weight),
+                "first_seen": first_seen,
+                "last_seen": last_seen,
+                "mean_lag_seconds": float(total_lag) / weight if weight else 0.0
+            }
+            for source, target, weight, first_seen, last_seen, total_lag in rows
+            if source in downstream or target in upstream
+        ]
+        edges.sort(key=lambda edge: (edge["first_seen"], edge["source"], edge["target"]))
+
+        return edges
+
+    @staticmethod
+    def _reachable(start: str, links: List[tuple]) -> set:
+        """Services reachable from start over directed (source, target) links."""
+        targets = {}
+        for source, target in links:
+            targets.setdefault(source, []).append(target)
+
+        seen = {start}
+        pending = [start]
+        while pending:
+            for target in targets.get(pending.pop(), []):
+                if target not in seen:
+                    seen.add(target)
+                    pending.append(target)
+        return seen
+
     def get_incident_timeline(self, incident_id: int) -> List[Event]:
         """
         Construct timeline for an incident.
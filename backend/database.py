@@ -2,9 +2,10 @@
 BLACKBOX Database Configuration
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from models import Base
+from functools import lru_cache
+from typing import Optional
 import os
 
 # Database URL - defaults to local PostgreSQL
@@ -20,13 +21,31 @@ engine = create_engine(DATABASE_URL, echo=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-def init_db():
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=None)
+def get_expected_revision() -> str:
+    """
+    Latest migration in migrations/versions.
+    Alembic is only imported the first time this is needed.
+    """
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config()
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def get_schema_revision() -> Optional[str]:
     """
-    Initialize database tables.
-    Called on application startup.
+    Migration currently applied to the database.
+    Schema changes are applied out-of-band with `alembic upgrade head`,
+    never on application startup.
     """
-    Base.metadata.create_all(bind=engine)
-    print("Database initialized successfully")
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
 
 
 def get_db():
@@ -3,25 +3,36 @@ BLACKBOX API
 Web-based incident reasoning platform
 """
 
+import time
+
+# Measured from here to the end of startup_event
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import List
 
-from database import get_db, init_db
+from database import engine, get_db, get_expected_revision, get_schema_revision
 from models import Event, Incident, IncidentEvent, IncidentStatus
 from schemas import (
     EventCreate, EventResponse, IncidentSummary, 
-    IncidentDetail, TimelineEvent
+    IncidentDetail, TimelineEvent, PropagationGraph, PropagationEdge
 )
 from correlation import CorrelationEngine
+from wire import WireResponse, WireRoute
+from admission import bulk_lane, incident_lane, ingest_lane
 
 app = FastAPI(
     title="BLACKBOX",
     description="Incident reasoning platform for understanding failures",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=WireResponse
 )
 
+# Negotiate compressed and MessagePack bodies on every API route
+app.router.route_class = WireRoute
+
 # CORS middleware for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -32,10 +43,20 @@ app.add_middleware(
 )
 
 
+# Filled in by startup_event
+cold_start_ms = None
+
+
 @app.on_event("startup")
 def startup_event():
-    """Initialize database on startup"""
-    init_db()
+    """
+    Record worker cold-start time.
+    No database work here - run `alembic upgrade head` before deploying.
+    """
+    global cold_start_ms
+    CorrelationEngine.check_dialect(engine.dialect.name)
+    cold_start_ms = round((time.perf_counter() - _import_started) * 1000, 1)
+    print(f"Worker started in {cold_start_ms} ms")
 
 
 @app.get("/")
@@ -48,7 +69,32 @@ def root():
     }
 
 
-@app.post("/events", response_model=EventResponse, status_code=201)
+@app.get("/ready")
+def ready():
+    """
+    Readiness check.
+    Ready once the database is reachable and migrated to the latest revision.
+    """
+    try:
+        revision = get_schema_revision()
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable or not migrated")
+
+    expected = get_expected_revision()
+    if revision != expected:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Schema at revision {revision}, expected {expected}"
+        )
+
+    return {
+        "status": "ready",
+        "schema_revision": revision,
+        "cold_start_ms": cold_start_ms
+    }
+
+
+@app.post("/events", response_model=EventResponse, status_code=201, dependencies=[Depends(ingest_lane)])
 def create_event(event: EventCreate, db: Session = Depends(get_db)):
     """
     Event ingestion endpoint.
@@ -85,10 +131,13 @@ def create_event(event: EventCreate, db: Session = Depends(get_db)):
     # Correlate event to existing incidents
     correlation_engine.correlate_event_to_incident(db_event)
 
+    # Update the service dependency index
+    correlation_engine.record_service_edges(db_event)
+
     return db_event
 
 
-@app.get("/incidents", response_model=List[IncidentSummary])
+@app.get("/incidents", response_model=List[IncidentSummary], dependencies=[Depends(incident_lane)])
 def list_incidents(
     status: str = None,
     environment: str = None,
@@ -109,7 +158,7 @@ def list_incidents(
     return incidents
 
 
-@app.get("/incidents/{incident_id}", response_model=IncidentDetail)
+@app.get("/incidents/{incident_id}", response_model=IncidentDetail, dependencies=[Depends(incident_lane)])
 def get_incident(incident_id: int, db: Session = Depends(get_db)):
     """
     Get detailed incident view with timeline.
@@ -161,7 +210,39 @@ def get_incident(incident_id: int, db: Session = Depends(get_db)):
     )
 
 
-@app.patch("/incidents/{incident_id}/resolve")
+@app.get("/incidents/{incident_id}/graph", response_model=PropagationGraph, dependencies=[Depends(incident_lane)])
+def get_incident_graph(incident_id: int, db: Session = Depends(get_db)):
+    """
+    Get the service propagation graph for an incident.
+    Built from the precomputed service edge index.
+    """
+    incident = db.query(Incident).filter(Incident.id == incident_id).first()
+
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+
+    correlation_engine = CorrelationEngine(db)
+    edges = correlation_engine.get_propagation_graph(incident)
+
+    # Services in order of first appearance, always including the primary service
+    services = []
+    for edge in edges:
+        for service in (edge["source"], edge["target"]):
+            if service not in services:
+                services.append(service)
+    if incident.primary_service not in services:
+        services.insert(0, incident.primary_service)
+
+    return PropagationGraph(
+        incident_id=incident.id,
+        primary_service=incident.primary_service,
+        environment=incident.environment,
+        services=services,
+        edges=[PropagationEdge(**edge) for edge in edges]
+    )
+
+
+@app.patch("/incidents/{incident_id}/resolve", dependencies=[Depends(incident_lane)])
 def resolve_incident(incident_id: int, db: Session = Depends(get_db)):
     """
     Mark incident as resolved.
@@ -182,7 +263,24 @@ def resolve_incident(incident_id: int, db: Session = Depends(get_db)):
     return {"status": "resolved", "incident_id": incident_id}
 
 
-@app.get("/events", response_model=List[EventResponse])
+@app.get("/archive/incidents/{incident_id}/timeline", response_model=List[TimelineEvent])
+def get_archived_incident_timeline(incident_id: int):
+    """
+    Rebuild an incident timeline from cold archive segments.
+    Reads memory-mapped segment files only - no database access.
+    """
+    # Imported on first use to keep it off the cold-start path
+    from archive import get_archived_timeline
+
+    timeline = get_archived_timeline(incident_id)
+
+    if not timeline:
+        raise HTTPException(status_code=404, detail="Incident not found in archive")
+
+    return [TimelineEvent(**event) for event in timeline]
+
+
+@app.get("/events", response_model=List[EventResponse], dependencies=[Depends(bulk_lane)])
 def list_events(
     service: str = None,
     environment: str = None,
@@ -0,0 +1,71 @@
+"""
+Initial schema: events, incidents, incident_events
+
+Matches the tables previously created by Base.metadata.create_all.
+Databases created that way should be stamped instead of upgraded:
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-01-28
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "events",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("service", sa.String(255), nullable=False),
+        sa.Column("environment", sa.String(50), nullable=False),
+        sa.Column("level", sa.Enum("INFO", "WARNING", "ERROR", name="eventlevel"), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("request_id", sa.String(255), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("received_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_events_service", "events", ["service"])
+    op.create_index("ix_events_environment", "events", ["environment"])
+    op.create_index("ix_events_request_id", "events", ["request_id"])
+    op.create_index("ix_events_timestamp", "events", ["timestamp"])
+
+    op.create_table(
+        "incidents",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("primary_service", sa.String(255), nullable=False),
+        sa.Column("environment", sa.String(50), nullable=False),
+        sa.Column("start_time", sa.DateTime(), nullable=False),
+        sa.Column("end_time", sa.DateTime(), nullable=True),
+        sa.Column("severity", sa.String(50), nullable=True),
+        sa.Column("status", sa.Enum("OPEN", "RESOLVED", name="incidentstatus"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_incidents_primary_service", "incidents", ["primary_service"])
+    op.create_index("ix_incidents_environment", "incidents", ["environment"])
+
+    op.create_table(
+        "incident_events",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("incident_id", sa.Integer(), sa.ForeignKey("incidents.id"), nullable=False),
+        sa.Column("event_id", sa.Integer(), sa.ForeignKey("events.id"), nullable=False),
+        sa.Column("correlation_reason", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_incident_events_incident_id", "incident_events", ["incident_id"])
+    op.create_index("ix_incident_events_event_id", "incident_events", ["event_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("incident_events")
+    op.drop_table("incidents")
+    op.drop_table("events")
+    sa.Enum(name="incidentstatus").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="eventlevel").drop(op.get_bind(), checkfirst=True)
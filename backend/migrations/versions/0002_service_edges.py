@@ -0,0 +1,47 @@
+"""
+Service dependency index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "service_edges",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("environment", sa.String(50), nullable=False),
+        sa.Column("source_service", sa.String(255), nullable=False),
+        sa.Column("target_service", sa.String(255), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("weight", sa.Integer(), nullable=False),
+        sa.Column("first_seen", sa.DateTime(), nullable=False),
+        sa.Column("last_seen", sa.DateTime(), nullable=False),
+        sa.Column("total_lag_seconds", sa.Float(), nullable=False),
+        sa.UniqueConstraint(
+            "environment", "bucket_start", "source_service", "target_service",
+            name="uq_service_edges_hop"
+        ),
+    )
+    op.create_table(
+        "request_services",
+        sa.Column("environment", sa.String(50), primary_key=True),
+        sa.Column("request_id", sa.String(255), primary_key=True),
+        sa.Column("service", sa.String(255), primary_key=True),
+        sa.Column("first_seen", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("request_services")
+    op.drop_table("service_edges")
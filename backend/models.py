@@ -3,7 +3,7 @@ BLACKBOX Database Models
 Immutable event storage and incident correlation
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, Float, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -88,3 +88,48 @@ class IncidentEvent(Base):
 
     def __repr__(self):
         return f"<IncidentEvent(incident_id={self.incident_id}, event_id={self.event_id}, reason={self.correlation_reason})>"
+
+
+class ServiceEdge(Base):
+    """
+    Service-to-service propagation observed through shared request_ids.
+    Aggregated per time bucket so incident graphs are index lookups.
+    """
+    __tablename__ = "service_edges"
+    __table_args__ = (
+        # One row per hop and bucket; also serves environment + bucket lookups
+        UniqueConstraint(
+            "environment", "bucket_start", "source_service", "target_service",
+            name="uq_service_edges_hop"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    environment = Column(String(50), nullable=False)
+    source_service = Column(String(255), nullable=False)
+    target_service = Column(String(255), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    weight = Column(Integer, nullable=False, default=0)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
+    total_lag_seconds = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<ServiceEdge({self.source_service} -> {self.target_service}, env={self.environment}, weight={self.weight})>"
+
+
+class RequestService(Base):
+    """
+    First appearance of each service within a request_id.
+    State behind the service edge index: hops are derived from these rows,
+    so an event counts towards edges once it has been recorded here.
+    """
+    __tablename__ = "request_services"
+
+    environment = Column(String(50), primary_key=True)
+    request_id = Column(String(255), primary_key=True)
+    service = Column(String(255), primary_key=True)
+    first_seen = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<RequestService({self.request_id}: {self.service} at {self.first_seen})>"
@@ -104,3 +104,22 @@ class IncidentDetail(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class PropagationEdge(BaseModel):
+    """Directed service edge, source seen before target"""
+    source: str
+    target: str
+    weight: int
+    first_seen: datetime
+    last_seen: datetime
+    mean_lag_seconds: float
+
+
+class PropagationGraph(BaseModel):
+    """Service propagation graph for an incident window"""
+    incident_id: int
+    primary_service: str
+    environment: str
+    services: List[str]
+    edges: List[PropagationEdge]
@@ -0,0 +1,281 @@
+"""
+BLACKBOX What-If Re-Correlation
+Offline, vectorized replay of incident detection for parameter sweeps
+"""
+
+from sqlalchemy.orm import Session
+from models import Event
+from correlation import CorrelationEngine
+from archive import parse_utc
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+from itertools import product
+import numpy as np
+
+
+MICROS_PER_MINUTE = 60 * 1_000_000
+
+
+class EventArrays:
+    """
+    Column arrays for an event range, sorted by timestamp.
+    String columns are dictionary-encoded into integer codes.
+    """
+
+    def __init__(self, timestamps, services, environments, levels, request_ids):
+        ts = np.asarray(timestamps, dtype="datetime64[us]").astype(np.int64)
+        order = np.argsort(ts, kind="stable")
+
+        self.timestamps = ts[order]
+        self.service_names, service_codes = np.unique(np.asarray(services, dtype=object)[order].astype(str), return_inverse=True)
+        self.environment_names, environment_codes = np.unique(np.asarray(environments, dtype=object)[order].astype(str), return_inverse=True)
+        self.services = service_codes.astype(np.int64)
+        self.environments = environment_codes.astype(np.int64)
+        self.is_error = np.asarray(levels, dtype=object)[order] == "error"
+
+        # Request IDs: -1 for missing, otherwise a dense code
+        rid = np.asarray(request_ids, dtype=object)[order]
+        present = rid != None  # noqa: E711 - elementwise comparison
+        self.request_ids = np.full(len(rid), -1, dtype=np.int64)
+        if present.any():
+            _, codes = np.unique(rid[present].astype(str), return_inverse=True)
+            self.request_ids[present] = codes
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def from_database(cls, db: Session, start: datetime, end: datetime) -> "EventArrays":
+        rows = db.query(
+            Event.timestamp, Event.service, Event.environment, Event.level, Event.request_id
+        ).filter(
+            Event.timestamp >= start,
+            Event.timestamp < end
+        ).order_by(Event.timestamp.asc(), Event.id.asc()).yield_per(50000)
+
+        columns = ([], [], [], [], [])
+        for timestamp, service, environment, level, request_id in rows:
+            columns[0].append(timestamp)
+            columns[1].append(service)
+            columns[2].append(environment)
+            columns[3].append(getattr(level, "value", level))
+            columns[4].append(request_id)
+        return cls(*columns)
+
+    @classmethod
+    def from_archive(cls, segments, start: datetime, end: datetime) -> "EventArrays":
+        columns = ([], [], [], [], [])
+        for segment in segments:
+            if not segment.overlaps(start, end):
+                continue
+            for event in segment.scan(start, end):
+                columns[0].append(event["timestamp"])
+                columns[1].append(event["service"])
+                columns[2].append(event["environment"])
+                columns[3].append(event["level"])
+                columns[4].append(event["request_id"])
+        return cls(*columns)
+
+
+def _to_datetime(micros: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(microseconds=int(micros))
+
+
+def _previous_occurrence(keys: np.ndarray) -> np.ndarray:
+    """
+    For every position, the index of the previous position with the same key,
+    or -1. Negative keys never match.
+    """
+    previous = np.full(len(keys), -1, dtype=np.int64)
+    order = np.lexsort((np.arange(len(keys)), keys))
+    sorted_keys = keys[order]
+    repeat = (sorted_keys[1:] == sorted_keys[:-1]) & (sorted_keys[1:] >= 0)
+    previous[order[1:][repeat]] = order[:-1][repeat]
+    return previous
+
+
+def sweep(
+    arrays: EventArrays,
+    thresholds: Sequence[int] = (CorrelationEngine.ERROR_THRESHOLD,),
+    windows: Sequence[int] = (CorrelationEngine.TIME_WINDOW_MINUTES,),
+    correlation_windows: Sequence[int] = (CorrelationEngine.CORRELATION_WINDOW_MINUTES,),
+    reopen_after_minutes: Optional[int] = None
+) -> List[Dict]:
+    """
+    Replay threshold detection and the three correlation rules for every
+    combination of parameters.
+
+    Event timestamps stand in for ingestion time, so results match the live
+    engine when events arrive in order. Live incidents stay open until they
+    are resolved manually; reopen_after_minutes treats an incident as
+    resolved that long after it opened, allowing a new one to open.
+    """
+    n = len(arrays)
+    results = []
+    if n == 0:
+        return [
+            {"threshold": t, "window_minutes": w, "correlation_window_minutes": c, "incidents": []}
+            for t, w, c in product(thresholds, windows, correlation_windows)
+        ]
+
+    ts = arrays.timestamps - arrays.timestamps[0]
+    positions = np.arange(n, dtype=np.int64)
+    window_us = np.asarray(windows, dtype=np.int64) * MICROS_PER_MINUTE
+    correlation_us = np.asarray(correlation_windows, dtype=np.int64) * MICROS_PER_MINUTE
+    reopen_us = None if reopen_after_minutes is None else reopen_after_minutes * MICROS_PER_MINUTE
+
+    # Offsetting each (service, environment) group by a span larger than the
+    # whole range lets one sorted array answer per-group window queries.
+    span = int(ts[-1]) + int(window_us.max()) + 1
+    group = arrays.services * len(arrays.environment_names) + arrays.environments
+    group_positions = np.sort(group * n + positions)
+    env_positions = np.sort(arrays.environments * n + positions)
+
+    # Rolling error counts for every window size at once: shape (windows, errors)
+    error_positions = np.flatnonzero(arrays.is_error)
+    error_key = group[error_positions] * span + ts[error_positions]
+    error_order = np.argsort(error_key, kind="stable")
+    error_sorted = error_key[error_order]
+    error_index = np.arange(len(error_sorted))
+    window_start = np.searchsorted(error_sorted, error_sorted[None, :] - window_us[:, None], side="left")
+    counts = error_index[None, :] - window_start + 1
+
+    # Rule 1 pairs: (event, previous event with the same environment + request_id)
+    rid_key = np.where(
+        arrays.request_ids >= 0,
+        arrays.request_ids * len(arrays.environment_names) + arrays.environments,
+        -1
+    )
+    previous_rid = _previous_occurrence(rid_key)
+    repeats = np.flatnonzero(previous_rid >= 0)
+    repeats_by_env = {}
+    for env in range(len(arrays.environment_names)):
+        later = repeats[arrays.environments[repeats] == env]
+        repeats_by_env[env] = (later, previous_rid[later])
+
+    for w, window in enumerate(windows):
+        for threshold in thresholds:
+            crossed = np.flatnonzero(counts[w] >= threshold)
+            crossed_positions = error_positions[error_order[crossed]]
+            crossed_groups = group[crossed_positions]
+
+            if reopen_us is None:
+                # Open incidents suppress new ones: first crossing per group
+                _, first = np.unique(crossed_groups, return_index=True)
+                selected = crossed[first]
+            else:
+                selected = []
+                last_opened: Dict[int, int] = {}
+                for index, position, key in zip(crossed.tolist(), crossed_positions.tolist(), crossed_groups.tolist()):
+                    if key not in last_opened or ts[position] - ts[last_opened[key]] >= reopen_us:
+                        last_opened[key] = position
+                        selected.append(index)
+                selected = np.asarray(selected, dtype=np.int64)
+
+            opened = error_positions[error_order[selected]]
+            order = np.argsort(opened, kind="stable")
+            opened = opened[order]
+            severity_count = counts[w][selected][order]
+
+            opened_at = ts[opened]
+            start_time = opened_at - window_us[w]
+            environment = arrays.environments[opened]
+            if reopen_us is None:
+                close = np.full(len(opened), n, dtype=np.int64)
+            else:
+                close = np.searchsorted(ts, opened_at + reopen_us, side="left")
+
+            # Rule 3: every same-environment event from the trigger until close
+            correlated = (
+                np.searchsorted(env_positions, environment * n + close, side="left")
+                - np.searchsorted(env_positions, environment * n + opened, side="left")
+            )
+
+            # Rule 2: same service within the correlation window of start_time
+            group_base = group[opened] * n
+            rule2_stop = np.minimum(
+                np.searchsorted(ts, start_time[:, None] + correlation_us[None, :], side="right"),
+                close[:, None]
+            )
+            rule2 = np.maximum(
+                np.searchsorted(group_positions, group_base[:, None] + rule2_stop, side="left")
+                - np.searchsorted(group_positions, group_base + opened, side="left")[:, None],
+                0
+            )
+
+            # Rule 1: request_id already seen among this incident's correlations
+            rule1 = np.zeros(len(opened), dtype=np.int64)
+            for i, (position, env, stop) in enumerate(zip(opened.tolist(), environment.tolist(), close.tolist())):
+                later, earlier = repeats_by_env[env]
+                lo, hi = np.searchsorted(later, [position, stop], side="left")
+                rule1[i] = int(np.count_nonzero(earlier[lo:hi] >= position))
+
+            base = int(arrays.timestamps[0])
+            for c, correlation_window in enumerate(correlation_windows):
+                incidents = []
+                for i, position in enumerate(opened.tolist()):
+                    incidents.append({
+                        "service": str(arrays.service_names[arrays.services[position]]),
+                        "environment": str(arrays.environment_names[arrays.environments[position]]),
+                        "opened_at": _to_datetime(base + opened_at[i]),
+                        "start_time": _to_datetime(base + start_time[i]),
+                        "severity": "high" if severity_count[i] >= 10 else "medium",
+                        "correlated_events": int(correlated[i]),
+                        "rule_hits": {
+                            "same_request_id": int(rule1[i]),
+                            "same_service_time_window": int(rule2[i, c]),
+                            "environment_incident_window": int(correlated[i]),
+                        },
+                    })
+                results.append({
+                    "threshold": threshold,
+                    "window_minutes": window,
+                    "correlation_window_minutes": correlation_window,
+                    "incidents": incidents,
+                })
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Replay incident detection for a parameter sweep")
+    parser.add_argument("--start", required=True, help="Inclusive start (ISO 8601, UTC)")
+    parser.add_argument("--end", required=True, help="Exclusive end (ISO 8601, UTC)")
+    parser.add_argument("--threshold", type=int, nargs="+", default=[CorrelationEngine.ERROR_THRESHOLD])
+    parser.add_argument("--window", type=int, nargs="+", default=[CorrelationEngine.TIME_WINDOW_MINUTES])
+    parser.add_argument("--correlation-window", type=int, nargs="+", default=[CorrelationEngine.CORRELATION_WINDOW_MINUTES])
+    parser.add_argument("--reopen-after", type=int, default=None, help="Minutes before an incident may reopen")
+    parser.add_argument("--archive", action="store_true", help="Read from archive segments instead of the database")
+    parser.add_argument("--json", action="store_true", help="Print full results as JSON")
+    args = parser.parse_args()
+
+    start = parse_utc(args.start)
+    end = parse_utc(args.end)
+
+    if args.archive:
+        from archive import open_segments
+        arrays = EventArrays.from_archive(open_segments(), start, end)
+    else:
+        from database import SessionLocal
+        db = SessionLocal()
+        try:
+            arrays = EventArrays.from_database(db, start, end)
+        finally:
+            db.close()
+
+    results = sweep(arrays, args.threshold, args.window, args.correlation_window, args.reopen_after)
+
+    if args.json:
+        print(json.dumps(results, default=str, indent=2))
+    else:
+        print(f"Replayed {len(arrays)} events")
+        for result in results:
+            first = min((i["opened_at"] for i in result["incidents"]), default=None)
+            print(
+                f"threshold={result['threshold']:<3} window={result['window_minutes']:<3} "
+                f"correlation_window={result['correlation_window_minutes']:<3} "
+                f"incidents={len(result['incidents']):<4} first_opened={first}"
+            )
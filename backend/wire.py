@@ -0,0 +1,263 @@
+"""
+BLACKBOX Wire Formats
+Compressed and binary request/response bodies, negotiated via headers
+"""
+
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.background import BackgroundTask
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, List, Mapping, Optional
+import gzip
+import json
+import zlib
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+MAX_BODY_BYTES = 10 * 1024 * 1024  # Decompressed request body limit
+MIN_COMPRESS_BYTES = 1024  # Small responses are not worth compressing
+THREADPOOL_BYTES = 64 * 1024  # Larger responses are compressed off the event loop
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Response format chosen for the current request, read by WireResponse
+_response_format: ContextVar[str] = ContextVar("response_format", default="json")
+
+
+@lru_cache(maxsize=None)
+def _msgpack():
+    """
+    MessagePack module, or None when not installed.
+    Imported on first use so plain JSON workers never load it.
+    """
+    try:
+        import msgpack
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return msgpack
+
+
+@lru_cache(maxsize=None)
+def _zstandard():
+    """Zstandard module, or None when not installed. Imported on first use."""
+    try:
+        import zstandard
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return zstandard
+
+
+def _accepted(header: Optional[str]) -> List[str]:
+    """
+    Media types or codings from an Accept* header, most preferred first.
+    Entries with q=0 are dropped; ties keep header order.
+    """
+    accepted = []
+    for part in (header or "").split(","):
+        value, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, weight = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(weight)
+                except ValueError:
+                    quality = 0.0
+        if value and quality > 0:
+            accepted.append((quality, value.lower()))
+    accepted.sort(key=lambda entry: entry[0], reverse=True)
+    return [value for _, value in accepted]
+
+
+def _wants_msgpack(accept: Optional[str]) -> bool:
+    """True if MessagePack is preferred over JSON in the Accept header."""
+    for media in _accepted(accept):
+        if media in MSGPACK_TYPES:
+            return _msgpack() is not None
+        if media in ("application/json", "application/*", "*/*"):
+            return False
+    return False
+
+
+def decode_content(body: bytes, encoding: Optional[str]) -> bytes:
+    """
+    Undo Content-Encoding on a request body.
+    Output is capped at MAX_BODY_BYTES to guard against decompression bombs.
+    """
+    encoding = (encoding or "identity").strip().lower()
+
+    if encoding == "identity":
+        return body
+
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            decoded = decompressor.decompress(body, MAX_BODY_BYTES + 1)
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Malformed gzip body")
+        if len(decoded) > MAX_BODY_BYTES or decompressor.unconsumed_tail:
+            raise HTTPException(status_code=413, detail="Decompressed body too large")
+        if not decompressor.eof:
+            raise HTTPException(status_code=400, detail="Truncated gzip body")
+        return decoded
+
+    zstandard = _zstandard() if encoding == "zstd" else None
+    if zstandard is not None:
+        decompressor = zstandard.ZstdDecompressor()
+        try:
+            if zstandard.frame_content_size(body) > MAX_BODY_BYTES:
+                raise HTTPException(status_code=413, detail="Decompressed body too large")
+            # One-shot decompression rejects truncated frames
+            return decompressor.decompress(body, max_output_size=MAX_BODY_BYTES)
+        except zstandard.ZstdError:
+            pass
+
+        # Frames without a declared size fail the same way when they exceed
+        # the limit; a bounded streaming read tells the two cases apart.
+        try:
+            reader = decompressor.stream_reader(body)
+            total = 0
+            while True:
+                chunk = reader.read(65536)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > MAX_BODY_BYTES:
+                    raise HTTPException(status_code=413, detail="Decompressed body too large")
+        except zstandard.ZstdError:
+            pass
+        raise HTTPException(status_code=400, detail="Malformed or truncated zstd body")
+
+    raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+
+
+def encode_content(body: bytes, accept_encoding: Optional[str]):
+    """
+    Compress a response body for the best coding the client accepts.
+    Returns (body, coding), with coding None when left uncompressed.
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+
+    for coding in _accepted(accept_encoding):
+        if coding == "zstd" and _zstandard() is not None:
+            return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).compress(body), "zstd"
+        if coding in ("gzip", "*"):
+            return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+        if coding == "identity":
+            break
+    return body, None
+
+
+class WireRequest(Request):
+    """
+    Request with Content-Encoding removed from the body and
+    MessagePack bodies decoded in place of JSON.
+    """
+
+    def __init__(self, scope, receive, msgpack_body: bool = False):
+        super().__init__(scope, receive)
+        self.msgpack_body = msgpack_body
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_decoded_body"):
+            raw = await super().body()
+            encoding = self.headers.get("content-encoding")
+            if (encoding or "identity").strip().lower() == "identity":
+                self._decoded_body = raw
+            else:
+                # Output size is unknown until inflated; keep it off the event loop
+                self._decoded_body = await run_in_threadpool(decode_content, raw, encoding)
+        return self._decoded_body
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            if self.msgpack_body:
+                msgpack = _msgpack()
+                try:
+                    self._json = msgpack.unpackb(body, raw=False, timestamp=3)
+                except (ValueError, msgpack.UnpackException):
+                    raise HTTPException(status_code=400, detail="Malformed MessagePack body")
+            else:
+                self._json = json.loads(body)
+        return self._json
+
+
+class WireResponse(JSONResponse):
+    """JSON response that renders as MessagePack when the client asked for it."""
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None
+    ):
+        # Explicit signature: FastAPI reads the status_code default for OpenAPI
+        if media_type is None and _response_format.get() == "msgpack":
+            media_type = MSGPACK_TYPES[0]
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        if self.media_type == MSGPACK_TYPES[0]:
+            return _msgpack().packb(content, use_bin_type=True)
+        return super().render(content)
+
+
+class WireRoute(APIRoute):
+    """
+    Route class negotiating body formats from content headers:
+
+    - Content-Encoding: gzip | zstd          (request decompression)
+    - Content-Type: application/msgpack      (binary request body)
+    - Accept: application/msgpack            (binary response body)
+    - Accept-Encoding: zstd | gzip           (response compression)
+    """
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def wire_route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            msgpack_body = content_type in MSGPACK_TYPES
+
+            scope = request.scope
+            if msgpack_body:
+                if _msgpack() is None:
+                    raise HTTPException(status_code=415, detail="MessagePack is not supported")
+                # Present the body as JSON so FastAPI hands it to request.json()
+                scope = dict(scope)
+                scope["headers"] = [
+                    (key, b"application/json" if key == b"content-type" else value)
+                    for key, value in scope["headers"]
+                ]
+
+            wants_msgpack = _wants_msgpack(request.headers.get("accept"))
+            token = _response_format.set("msgpack" if wants_msgpack else "json")
+            try:
+                response = await original_route_handler(WireRequest(scope, request.receive, msgpack_body))
+            finally:
+                _response_format.reset(token)
+
+            response.headers.add_vary_header("Accept")
+            response.headers.add_vary_header("Accept-Encoding")
+
+            body = getattr(response, "body", None)
+            if body and "content-encoding" not in response.headers:
+                accept_encoding = request.headers.get("accept-encoding")
+                if len(body) >= THREADPOOL_BYTES:
+                    encoded, coding = await run_in_threadpool(encode_content, body, accept_encoding)
+                else:
+                    encoded, coding = encode_content(body, accept_encoding)
+                if coding:
+                    response.body = encoded
+                    response.headers["content-encoding"] = coding
+                    response.headers["content-length"] = str(len(encoded))
+
+            return response
+
+        return wire_route_handler
@@ -76,24 +76,25 @@ def scenario_cascading_failure():
     """Simulate a cascading failure across services"""
     print("\n=== Scenario: Cascading Service Failure ===\n")
     
+    # Shared request_id lets BLACKBOX derive the auth -> gateway -> web-app path
     base_req_id = f"cascade_{random.randint(1000, 9999)}"
     
     # Start with auth service
     create_event("auth-service", "prod", "error", 
-                "Redis connection refused", f"{base_req_id}_1")
+                "Redis connection refused", base_req_id)
     time.sleep(0.5)
     
     # Cascade to API gateway
     for i in range(4):
         create_event("api-gateway", "prod", "error", 
-                    "Auth validation timeout", f"{base_req_id}_2")
+                    "Auth validation timeout", base_req_id)
         time.sleep(0.3)
     
     # Cascade to user-facing services
     create_event("web-app", "prod", "error", 
-                "Failed to authenticate user", f"{base_req_id}_3")
+                "Failed to authenticate user", base_req_id)
     create_event("mobile-api", "prod", "error", 
-                "401 Unauthorized from gateway", f"{base_req_id}_4")
+                "401 Unauthorized from gateway", base_req_id)
     
     # More auth errors
     for i in range(3):